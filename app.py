@@ -1,147 +1,398 @@
 from flask import Flask, request, render_template, send_file
-import geopandas as gpd
-import wntr
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import FileTarget
+import numpy as np
 import os
 import tempfile
 import zipfile
 import io
+import re
+import posixpath
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+# geopandas, pandas, shapely e wntr são importados dentro das funções que os usam,
+# só no primeiro POST: o wntr sozinho leva alguns segundos para carregar
+
+# Tamanho máximo do corpo da requisição (os dois ZIPs juntos)
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
 
 # Inicializa a aplicação Flask
 app = Flask(__name__)
+# (aplicado pelo Werkzeug ao request.stream, lido em receive_uploads)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+# Opções de unidade reescritas no .inp gerado pelo wntr
+# (o .inp é tratado em bytes do início ao fim, sem decodificar/recodificar o texto)
+UNIT_LINES_RE = re.compile(rb'^[ \t]*(?:UNITS|FLOWUNITS|HEADLOSS).*\n?', re.IGNORECASE | re.MULTILINE)
+OPTIONS_HEADER_RE = re.compile(rb'^[ \t]*\[OPTIONS\][ \t]*\n', re.IGNORECASE | re.MULTILINE)
+UNIT_OPTIONS = b'Units               LPS\nFlowUnits           LPS\nHeadloss            H-W\n'
+
+# Trecho final (constante) das linhas de junções e tubos, no mesmo formato de wntr.epanet.io
+JUNCTION_ROW_TAIL = ' {:24} {:>3s}\n'.format('', ';')
+PIPE_ROW_TAIL = ' {:15.11g} {:>20s} {:>3s}\n'.format(0.0, 'Open', ';')
+
+# Fatores de conversão para SI, já como recíprocos (aplicados por multiplicação
+# sobre as colunas inteiras)
+FT_TO_M = 1.0 / 3.280839895054167          # Cota (pés -> m)
+GPM_TO_M3S = 1.0 / 15850.32314147994       # Demanda (gpm -> m³/s)
+IN_TO_M = 1.0 / 39.37007874                # diameter (polegadas -> m)
+FT_TO_M_LENGTH = 1.0 / 3.280839895032449   # Shape__Len (pés -> m)
+
+# Tamanho dos blocos lidos do corpo da requisição no upload
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Cache dos .inp já gerados, indexado pelo hash dos ZIPs enviados
+INP_CACHE_MAXSIZE = 32
+INP_CACHE = OrderedDict()
+INP_CACHE_LOCK = threading.Lock()
+
+def coordinate_keys(coords):
+    """
+    Converte coordenadas (N, 2) em chaves inteiras int64, arredondadas em 6 casas
+    decimais. Inteiros são comparados exatamente, sem as armadilhas de floats.
+    """
+    return np.rint(coords * 1e6).astype(np.int64)
+
+def invalid_fids_message(invalid, layer, expected):
+    """
+    Mensagem de erro para as geometrias inválidas de um shapefile, listando as
+    FIDs (as 10 primeiras) marcadas na máscara booleana `invalid`.
+    """
+    fids = np.flatnonzero(invalid)
+    listed = ', '.join(map(str, fids[:10].tolist())) + (', ...' if len(fids) > 10 else '')
+    return (f"O shapefile de {layer} contém geometrias nulas, vazias ou com várias "
+            f"partes (FID: {listed}); {expected}.")
+
+def link_endpoints(geometry):
+    """
+    Retorna as coordenadas inicial e final de cada trecho como dois arrays (N, 2).
+    Só aceita linhas simples: trechos sem geometria, vazios ou com várias partes
+    (MultiLineString) geram um ValueError com as FIDs correspondentes.
+    """
+    import shapely
+    # (get_coordinates ignora geometrias nulas/vazias, o que desalinharia os índices abaixo)
+    type_ids = shapely.get_type_id(geometry)
+    invalid = ~np.isin(type_ids, (shapely.GeometryType.LINESTRING, shapely.GeometryType.LINEARRING))
+    invalid |= shapely.is_empty(geometry)
+    if invalid.any():
+        raise ValueError(invalid_fids_message(invalid, 'trechos', 'cada trecho deve ser uma linha simples'))
+    coords, idx = shapely.get_coordinates(geometry, return_index=True)
+    positions = np.arange(len(geometry))
+    first = np.searchsorted(idx, positions)
+    last = np.searchsorted(idx, positions, side="right") - 1
+    return coords[first], coords[last]
+
+def node_coordinates(geometry):
+    """
+    Retorna as coordenadas de cada nó como um array (N, 2), na ordem das linhas.
+    Só aceita pontos simples: nós sem geometria, vazios ou com várias partes
+    (MultiPoint) geram um ValueError com as FIDs correspondentes.
+    """
+    import shapely
+    # (get_coordinates ignora geometrias nulas/vazias e devolve todas as partes de um
+    # MultiPoint, o que desalinharia as coordenadas das colunas Cota/Demanda)
+    invalid = shapely.get_type_id(geometry) != shapely.GeometryType.POINT
+    invalid |= shapely.is_empty(geometry)
+    if invalid.any():
+        raise ValueError(invalid_fids_message(invalid, 'nós', 'cada nó deve ser um ponto simples'))
+    return shapely.get_coordinates(geometry)
+
+def unique_nodes(starts, ends):
+    """
+    Identifica os nós distintos entre as extremidades dos trechos.
+    Retorna as chaves inteiras (M, 2) dos nós (ver coordinate_keys), na ordem em
+    que aparecem nos trechos, e um array (N, 2) com o índice do nó inicial e final
+    de cada trecho.
+    """
+    points = coordinate_keys(np.stack([starts, ends], axis=1).reshape(-1, 2))
+    view = points.view(np.dtype([('x', 'i8'), ('y', 'i8')])).ravel()
+    uniq, first, inverse = np.unique(view, return_index=True, return_inverse=True)
+    # np.unique ordena as coordenadas; reordena pela primeira aparição
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return uniq[order].view('i8').reshape(-1, 2), rank[inverse].reshape(-1, 2)
+
+def file_key(path):
+    """
+    Hash BLAKE2b do conteúdo de um arquivo, lido em blocos.
+    """
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, lambda: hashlib.blake2b(digest_size=16)).digest()
+
+def upload_key(zip_nodes_path, zip_links_path):
+    """
+    Chave do cache: hash do conteúdo dos dois arquivos ZIP.
+    """
+    return file_key(zip_nodes_path), file_key(zip_links_path)
+
+def get_cached_inp(key):
+    with INP_CACHE_LOCK:
+        inp_content = INP_CACHE.get(key)
+        if inp_content is not None:
+            INP_CACHE.move_to_end(key)
+        return inp_content
+
+def cache_inp(key, inp_content):
+    with INP_CACHE_LOCK:
+        INP_CACHE[key] = inp_content
+        INP_CACHE.move_to_end(key)
+        if len(INP_CACHE) > INP_CACHE_MAXSIZE:
+            INP_CACHE.popitem(last=False)
+
+def find_shapefile_member(names):
+    """
+    Escolhe o membro .shp do ZIP, na raiz ou em uma subpasta (o resultado comum de
+    compactar uma pasta), ignorando os metadados do macOS (__MACOSX/, ._*).
+    O ZIP deve conter exatamente um .shp.
+    """
+    shp_names = [name for name in names
+                 if name.lower().endswith('.shp')
+                 and not name.startswith('__MACOSX/')
+                 and not posixpath.basename(name).startswith('._')]
+    if not shp_names:
+        raise FileNotFoundError("Não foi possível encontrar o arquivo .shp dentro de um dos arquivos ZIP.")
+    if len(shp_names) > 1:
+        raise ValueError(f"O arquivo ZIP contém mais de um .shp ({', '.join(shp_names)}); "
+                         "envie apenas um shapefile por arquivo.")
+    return shp_names[0]
+
+def read_zipped_shapefile(zip_path, columns):
+    """
+    Lê o shapefile contido no arquivo ZIP em zip_path pelo GDAL (/vsizip/), sem
+    extrair os arquivos nem descompactá-los inteiros na memória. Apenas as colunas
+    informadas são lidas do DBF.
+    """
+    import geopandas as gpd
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        shp_name = find_shapefile_member(zip_ref.namelist())
+    # (o caminho aponta exatamente para o membro escolhido, inclusive em subpastas)
+    return gpd.read_file(f"/vsizip/{zip_path}/{shp_name}", engine="pyogrio", use_arrow=True, columns=columns)
+
+@functools.lru_cache(maxsize=None)
+def inp_template():
+    """
+    Gera, uma única vez, o .inp de uma rede vazia pelo wntr, já com as unidades
+    corretas. As linhas de junções, tubos e coordenadas são inseridas depois.
+    """
+    import wntr
+    wn = wntr.network.WaterNetworkModel()
+    # (o diretório temporário é removido mesmo se a escrita ou a leitura falhar)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_inp_path = os.path.join(temp_dir, 'modelo.inp')
+        wntr.network.write_inpfile(wn, output_inp_path)
+        with open(output_inp_path, 'rb') as file:
+            data = file.read()
+
+    # Ajusta o arquivo .inp para garantir as unidades corretas
+    data = UNIT_LINES_RE.sub(b'', data)
+    return OPTIONS_HEADER_RE.sub(lambda m: m.group(0) + UNIT_OPTIONS, data, count=1)
+
+def insert_section_rows(inp_content, section, rows):
+    """
+    Insere as linhas logo após o cabeçalho e a linha de rótulos da seção.
+    """
+    match = re.search(rb'^\[' + section + rb'\]\n[^\n]*\n', inp_content, re.MULTILINE)
+    return inp_content[:match.end()] + rows + inp_content[match.end():]
+
+def format_values(values, spec):
+    """
+    Formata cada elemento de um array com o especificador `spec` (ex.: '%15.11g').
+    """
+    return np.char.mod(spec, np.asarray(values))
+
+def join_columns(columns, tail):
+    """
+    Concatena, elemento a elemento, colunas de strings separadas por espaço,
+    terminando cada linha com `tail`. Retorna o texto de todas as linhas, em bytes.
+    """
+    rows = columns[0]
+    for column in columns[1:]:
+        rows = np.char.add(np.char.add(rows, ' '), column)
+    return ''.join(np.char.add(rows, tail).tolist()).encode('utf-8')
+
+def write_inp(node_ids, node_coords, elevations, demands,
+              link_ids, start_nodes, end_nodes, lengths, diameters, roughness):
+    """
+    Monta o .inp a partir de arrays em unidades SI, no mesmo formato que
+    wntr.network.write_inpfile, sem criar um WaterNetworkModel.
+    As linhas são montadas à mão e devem ser mantidas em sincronia com _JUNC_ENTRY,
+    _PIPE_ENTRY e o formato de [COORDINATES] de wntr.epanet.io; por isso o wntr é
+    fixado em 1.5.0 no Dockerfile (conferir a saída contra write_inpfile antes de
+    atualizá-lo).
+    """
+    from wntr.epanet.util import FlowUnits, HydParam, from_si
+    # (unidades em que o wntr escreve o .inp de uma rede nova)
+    flow_units = FlowUnits.GPM
+    junction_rows = join_columns([
+        np.char.add(' ', format_values(node_ids, '%-20s')),
+        format_values(from_si(flow_units, elevations, HydParam.Elevation), '%15.11g'),
+        format_values(from_si(flow_units, demands, HydParam.Demand), '%15.11g'),
+    ], JUNCTION_ROW_TAIL)
+    pipe_rows = join_columns([
+        np.char.add(' ', format_values(link_ids, '%-20s')),
+        format_values(start_nodes, '%-20s'),
+        format_values(end_nodes, '%-20s'),
+        format_values(from_si(flow_units, lengths, HydParam.Length), '%15.11g'),
+        format_values(from_si(flow_units, diameters, HydParam.PipeDiameter), '%15.11g'),
+        format_values(from_si(flow_units, roughness, HydParam.RoughnessCoeff), '%15.11g'),
+    ], PIPE_ROW_TAIL)
+    coordinate_rows = join_columns([
+        format_values(node_ids, '%-10s'),
+        format_values(node_coords[:, 0], '%20.9f'),
+        format_values(node_coords[:, 1], '%20.9f'),
+    ], '\n')
+
+    inp_content = inp_template()
+    inp_content = insert_section_rows(inp_content, b'JUNCTIONS', junction_rows)
+    inp_content = insert_section_rows(inp_content, b'PIPES', pipe_rows)
+    inp_content = insert_section_rows(inp_content, b'COORDINATES', coordinate_rows)
+    return inp_content
 
-# --- Coloque sua função convert_shp_to_inp aqui ---
-# (A mesma função do seu script original, sem alterações)
 def convert_shp_to_inp(zip_nodes_path, zip_links_path):
     """
-    Converte shapefiles de nós e trechos para um arquivo EPANET .inp,
-    aplicando as conversões de unidades necessárias.
+    Converte shapefiles de nós e trechos (os caminhos de cada arquivo ZIP)
+    para um arquivo EPANET .inp, aplicando as conversões de unidades necessárias.
+    A rede não passa por um WaterNetworkModel: o .inp é montado à mão por write_inp
+    (ver a observação sobre o formato do wntr nessa função).
+    Retorna o conteúdo do .inp em bytes ou, em caso de erro, a mensagem (str).
     """
+    import pandas as pd
+
     try:
-        # Cria diretórios temporários para extrair os arquivos
-        with tempfile.TemporaryDirectory() as temp_dir_nodes, tempfile.TemporaryDirectory() as temp_dir_links:
-            # Extrai os arquivos ZIP
-            with zipfile.ZipFile(zip_nodes_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir_nodes)
-            with zipfile.ZipFile(zip_links_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir_links)
-
-            # Encontra os arquivos .shp dentro dos diretórios extraídos
-            shapefile_nodes = next((os.path.join(temp_dir_nodes, f) for f in os.listdir(temp_dir_nodes) if f.endswith('.shp')), None)
-            shapefile_links = next((os.path.join(temp_dir_links, f) for f in os.listdir(temp_dir_links) if f.endswith('.shp')), None)
-
-            if not shapefile_nodes or not shapefile_links:
-                raise FileNotFoundError("Não foi possível encontrar o arquivo .shp dentro de um dos arquivos ZIP.")
-
-            # Leitura dos shapefiles
-            nodes_gdf = gpd.read_file(shapefile_nodes)
-            links_gdf = gpd.read_file(shapefile_links)
-
-            # Inicializa a rede EPANET
-            wn = wntr.network.WaterNetworkModel()
-
-            # Dicionário para armazenar os nós
-            nodes_dict = {}
-
-            # Adiciona os nós a partir das coordenadas dos trechos
-            for _, row in links_gdf.iterrows():
-                start_point = row.geometry.coords[0]
-                end_point = row.geometry.coords[-1]
-                start_coords = (round(start_point[0], 6), round(start_point[1], 6))
-                end_coords = (round(end_point[0], 6), round(end_point[1], 6))
-                if start_coords not in nodes_dict:
-                    node_id = f"N{len(nodes_dict) + 1}"
-                    nodes_dict[start_coords] = node_id
-                    wn.add_junction(node_id, base_demand=0, elevation=0, coordinates=start_coords)
-                if end_coords not in nodes_dict:
-                    node_id = f"N{len(nodes_dict) + 1}"
-                    nodes_dict[end_coords] = node_id
-                    wn.add_junction(node_id, base_demand=0, elevation=0, coordinates=end_coords)
-
-            # Validação e atualização dos nós
+        # Os mesmos arquivos já convertidos antes retornam direto do cache
+        key = upload_key(zip_nodes_path, zip_links_path)
+        inp_content = get_cached_inp(key)
+        if inp_content is not None:
+            return inp_content
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Leitura dos shapefiles direto dos arquivos ZIP, em paralelo
+            # (o GDAL libera o GIL durante a leitura)
+            nodes_future = executor.submit(read_zipped_shapefile, zip_nodes_path, ["Cota", "Demanda"])
+            links_future = executor.submit(read_zipped_shapefile, zip_links_path, ["diameter", "Shape__Len", "rugosidade"])
+            nodes_gdf = nodes_future.result()
+            links_gdf = links_future.result()
+
+            # Validação das colunas antes de qualquer processamento das geometrias
             required_node_cols = {'Cota', 'Demanda'}
             if not required_node_cols.issubset(nodes_gdf.columns):
                  raise ValueError(f"O shapefile de nós deve conter as colunas: {', '.join(required_node_cols)}")
-            for _, row in nodes_gdf.iterrows():
-                coords = (round(row.geometry.x, 6), round(row.geometry.y, 6))
-                node_id = nodes_dict.get(coords)
-                if node_id:
-                    junction = wn.get_node(node_id)
-                    junction.elevation = row['Cota'] / 3.280839895054167
-                    junction.demand_timeseries_list[0].base_value = row['Demanda'] / 15850.32314147994
-
-            # Validação e adição dos trechos
             required_link_cols = {'diameter', 'Shape__Len', 'rugosidade'}
             if not required_link_cols.issubset(links_gdf.columns):
                  raise ValueError(f"O shapefile de trechos deve conter as colunas: {', '.join(required_link_cols)}")
-            for _, row in links_gdf.iterrows():
-                start_point = row.geometry.coords[0]
-                end_point = row.geometry.coords[-1]
-                start_coords = (round(start_point[0], 6), round(start_point[1], 6))
-                end_coords = (round(end_point[0], 6), round(end_point[1], 6))
-                node1 = nodes_dict[start_coords]
-                node2 = nodes_dict[end_coords]
-                link_id = f"P{len(wn.links) + 1}"
-                diameter_m = row['diameter'] / 39.37007874
-                length_m = row['Shape__Len'] / 3.280839895032449
-                wn.add_pipe(link_id, node1, node2,
-                            length=length_m,
-                            diameter=diameter_m,
-                            roughness=row['rugosidade'],
-                            minor_loss=0.0)
-
-            # Salva a rede em um arquivo .inp temporário
-            with tempfile.NamedTemporaryFile(delete=False, mode='w+', suffix='.inp', encoding='utf-8') as temp_inp_file:
-                output_inp_path = temp_inp_file.name
-                wntr.network.write_inpfile(wn, output_inp_path)
-
-            # Ajusta o arquivo .inp para garantir as unidades corretas
-            with open(output_inp_path, 'r', encoding='utf-8') as file:
-                data = file.readlines()
-            options_index = -1
-            clean_data = []
-            for line in data:
-                 stripped_line = line.strip().upper()
-                 if stripped_line == '[OPTIONS]':
-                      options_index = len(clean_data)
-                 elif stripped_line.startswith(('UNITS', 'FLOWUNITS', 'HEADLOSS')):
-                      continue
-                 clean_data.append(line)
-            if options_index != -1:
-                options = ['Units               LPS\n', 'FlowUnits           LPS\n', 'Headloss            H-W\n']
-                clean_data[options_index+1:options_index+1] = options
-            
-            final_inp_content = "".join(clean_data)
-            os.remove(output_inp_path)
-            return final_inp_content
+
+            # Extrai de uma só vez as coordenadas dos nós e as extremidades dos trechos
+            points_future = executor.submit(node_coordinates, nodes_gdf.geometry.values)
+            starts, ends = link_endpoints(links_gdf.geometry.values)
+            point_coords = points_future.result()
+
+        # Os nós da rede são as extremidades distintas dos trechos
+        node_keys, link_nodes = unique_nodes(starts, ends)
+        node_ids = np.char.add("N", (np.arange(len(node_keys)) + 1).astype(str))
+
+        # Associação de cota/demanda a cada nó da rede
+        # (mesmas chaves inteiras das extremidades dos trechos)
+        point_keys = coordinate_keys(point_coords)
+        points = pd.DataFrame({
+            'x': point_keys[:, 0],
+            'y': point_keys[:, 1],
+            'elevation': nodes_gdf['Cota'].to_numpy() * FT_TO_M,
+            'demand': nodes_gdf['Demanda'].to_numpy() * GPM_TO_M3S,
+        })
+        # (havendo pontos repetidos na mesma coordenada, vale o último)
+        points = points.drop_duplicates(['x', 'y'], keep='last')
+        junctions = pd.DataFrame({'x': node_keys[:, 0], 'y': node_keys[:, 1], 'node': np.arange(len(node_keys))})
+        matched = points.merge(junctions, on=['x', 'y'])
+        elevations = np.zeros(len(node_keys))
+        demands = np.zeros(len(node_keys))
+        elevations[matched['node'].to_numpy()] = matched['elevation'].to_numpy()
+        demands[matched['node'].to_numpy()] = matched['demand'].to_numpy()
+
+        # Conversão dos trechos
+        diameter_m = links_gdf['diameter'].to_numpy() * IN_TO_M
+        length_m = links_gdf['Shape__Len'].to_numpy() * FT_TO_M_LENGTH
+        roughness = links_gdf['rugosidade'].to_numpy(dtype=float)
+        link_ids = np.char.add("P", (np.arange(len(links_gdf)) + 1).astype(str))
+        node1, node2 = node_ids[link_nodes].T
+
+        # Escreve o .inp diretamente a partir dos arrays
+        final_inp_content = write_inp(node_ids, node_keys / 1e6, elevations, demands,
+                                      link_ids, node1, node2, length_m, diameter_m, roughness)
+        cache_inp(key, final_inp_content)
+        return final_inp_content
     except Exception as e:
         # Retorna a mensagem de erro para ser exibida no site
         return f"Ocorreu um erro: {e}"
 
+def receive_uploads(temp_dir, field_names):
+    """
+    Lê o corpo multipart da requisição em blocos com o streaming-form-data, sem o
+    parser de formulários do Werkzeug, gravando cada arquivo em temp_dir à medida
+    que chega. Retorna um FileTarget por campo.
+    Os limites de formulário do Werkzeug não se aplicam aqui; o tamanho total é
+    limitado por MAX_CONTENT_LENGTH.
+    """
+    parser = StreamingFormDataParser(headers=request.headers)
+    targets = {}
+    for name in field_names:
+        targets[name] = FileTarget(os.path.join(temp_dir, f"{name}.zip"))
+        parser.register(name, targets[name])
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+    except Exception:
+        # Fecha os arquivos já abertos se o corpo for interrompido ou inválido
+        for target in targets.values():
+            target.on_finish()
+        raise
+    return targets
+
 # Rota para a página inicial (GET) e para o processamento do formulário (POST)
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        # Verifica se os arquivos foram enviados
-        if 'file_nodes' not in request.files or 'file_links' not in request.files:
-            return "Erro: Faltando um ou mais arquivos.", 400
-        
-        file_nodes = request.files['file_nodes']
-        file_links = request.files['file_links']
-
-        # Verifica se os nomes dos arquivos não estão vazios
-        if file_nodes.filename == '' or file_links.filename == '':
-            return "Erro: Selecione os dois arquivos.", 400
-        
-        # Chama a função de conversão
-        inp_content = convert_shp_to_inp(file_nodes, file_links)
+        # Rejeita uploads grandes demais antes de ler o corpo
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_SIZE:
+            return "Erro: Os arquivos enviados excedem o tamanho máximo permitido.", 413
+
+        # Os ZIPs são gravados em um diretório temporário enquanto chegam
+        # (o diretório é removido ao fim da requisição, mesmo em caso de erro)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            try:
+                uploads = receive_uploads(temp_dir, ('file_nodes', 'file_links'))
+            except ParseFailedException:
+                return "Erro: Faltando um ou mais arquivos.", 400
+
+            file_nodes = uploads['file_nodes']
+            file_links = uploads['file_links']
+
+            # Verifica se os arquivos foram enviados
+            if file_nodes.multipart_filename is None or file_links.multipart_filename is None:
+                return "Erro: Faltando um ou mais arquivos.", 400
+
+            # Verifica se os nomes dos arquivos não estão vazios
+            if file_nodes.multipart_filename == '' or file_links.multipart_filename == '':
+                return "Erro: Selecione os dois arquivos.", 400
+
+            # Chama a função de conversão
+            inp_content = convert_shp_to_inp(file_nodes.filename, file_links.filename)
 
         # Se o retorno for uma string de erro, exibe o erro
-        if inp_content.startswith("Ocorreu um erro:"):
+        # (em caso de sucesso o conteúdo do .inp já vem em bytes)
+        if isinstance(inp_content, str):
             return inp_content, 400
 
         # Se for sucesso, retorna o arquivo para download
         return send_file(
-            io.BytesIO(inp_content.encode('utf-8')),
+            io.BytesIO(inp_content),
             mimetype='text/plain',
             as_attachment=True,
             download_name='modelo_convertido.inp'